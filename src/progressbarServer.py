@@ -1,11 +1,14 @@
-from flask import Flask, jsonify, Response, send_from_directory, render_template_string
+from flask import Flask, jsonify, Response, request, render_template_string
 from werkzeug.utils import secure_filename, safe_join
 from flask_cors import CORS
 import os
 import time
+import gzip
+import hashlib
 import logging
+import mimetypes
 from dotenv import load_dotenv
-from threading import Thread
+from threading import Thread, Lock
 
 # Load environment variables
 load_dotenv()
@@ -22,16 +25,65 @@ app.logger.setLevel(logging.DEBUG)
 PROGRESS_FILE_PATH = os.path.join(BASE_DIR, 'progress.txt')
 SVG_DIR = BASE_DIR  # Assuming SVG files are stored in the BASE_DIR
 
-def file_watcher(filename, last_known_stamp=0):
+# Text formats worth compressing; PNG/JPEG covers are already compressed
+COMPRESSIBLE_TYPES = {'image/svg+xml', 'text/plain', 'application/json'}
+
+# In-memory asset cache: filename -> dict(stamp, body, gzip, etag, mimetype)
+_asset_cache = {}
+_asset_cache_lock = Lock()
+
+def load_asset(filepath):
+    """
+    Return the cached representation of a file, rebuilding it only when the
+    file's mtime/size changed. The ETag is a hash of the content, so a render
+    that rewrites identical bytes keeps the same ETag.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    stat = os.stat(filepath)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    asset = _asset_cache.get(filepath)
+    if asset is not None and asset['stamp'] == stamp:
+        return asset
+
+    with _asset_cache_lock:
+        asset = _asset_cache.get(filepath)
+        if asset is not None and asset['stamp'] == stamp:
+            return asset
+
+        with open(filepath, 'rb') as file:
+            body = file.read()
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        mimetype = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+
+        if asset is not None and asset['etag'] == etag:
+            # Same content rewritten by a new render: reuse the compressed copy
+            asset = dict(asset, stamp=stamp)
+        else:
+            compressed = None
+            if mimetype in COMPRESSIBLE_TYPES:
+                compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            asset = {
+                'stamp': stamp,
+                'body': body,
+                'gzip': compressed,
+                'etag': etag,
+                'mimetype': mimetype,
+            }
+        _asset_cache[filepath] = asset
+        return asset
+
+def file_watcher(filename, last_known_etag=None):
     """
     Generator function to watch for file changes.
+    Only content changes are reported, not rewrites with identical bytes.
     """
+    filepath = os.path.join(SVG_DIR, filename)
     while True:
         try:
-            stat = os.stat(os.path.join(SVG_DIR, filename))
-            if stat.st_mtime != last_known_stamp:
-                last_known_stamp = stat.st_mtime
-                yield f"data: update\n\n"
+            etag = load_asset(filepath)['etag']
+            if etag != last_known_etag:
+                last_known_etag = etag
+                yield f"data: {etag}\n\n"
         except FileNotFoundError:
             pass
         time.sleep(1)
@@ -60,13 +112,37 @@ def progressbar_view():
     <head>
         <meta charset="UTF-8">
         <title>Customized Bootstrap Progress Bar for OBS</title>
-        <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css">
         <style>
+            /* Subset of Bootstrap 4.5 progress styles, inlined so the overlay works offline */
+            *, ::after, ::before {
+                box-sizing: border-box;
+            }
             html, body {
                 margin: 0;
                 padding: 0;
                 overflow: hidden;
             }
+            .progress {
+                display: flex;
+                overflow: hidden;
+                font-size: .75rem;
+                border-radius: .25rem;
+            }
+            .progress-bar {
+                display: flex;
+                flex-direction: column;
+                justify-content: center;
+                overflow: hidden;
+                color: #fff;
+                text-align: center;
+                white-space: nowrap;
+                transition: width .6s ease;
+            }
+            @media (prefers-reduced-motion: reduce) {
+                .progress-bar {
+                    transition: none;
+                }
+            }
             .custom-container {
                 padding-right: 0;
                 padding-left: 0;
@@ -95,7 +171,7 @@ def progressbar_view():
 
     <script>
         function updateProgress() {
-            fetch('http://localhost:5000/progress')
+            fetch('/progress', { cache: 'no-store' })
                 .then(response => response.json())
                 .then(data => {
                     const progressBar = document.getElementById('progress-bar');
@@ -123,17 +199,37 @@ def updates(filename):
 def serve_svg(filename):
     filename = secure_filename(filename)
     filepath = safe_join(SVG_DIR, filename)
-    print(f"Attempting to serve: {filepath}: {secure_filename} in directory: {SVG_DIR}")  # Debug print
-    if os.path.exists(filepath):
-        print("File found, serving...")  # Debug print
-        return send_from_directory(SVG_DIR, filename)
-    else:
-        app.logger.error(f"File not found: {secure_filename} in directory: {SVG_DIR}")
+    try:
+        asset = load_asset(filepath) if filepath else None
+    except (FileNotFoundError, IsADirectoryError):
+        asset = None
+    if asset is None:
+        app.logger.error(f"File not found: {filename} in directory: {SVG_DIR}")
         return "File not found", 404
+
+    # Each encoding is a distinct representation, so it gets its own strong ETag
+    use_gzip = asset['gzip'] is not None and 'gzip' in request.accept_encodings
+    etag = f"{asset['etag']}-gz" if use_gzip else asset['etag']
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(asset['gzip'] if use_gzip else asset['body'], mimetype=asset['mimetype'])
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    if asset['gzip'] is not None:
+        response.vary.add('Accept-Encoding')
+    return response
     
 @app.route('/view/<filename>')
 def view_svg(filename):
     if filename in SVG_FILES:
+        try:
+            initial_etag = load_asset(os.path.join(SVG_DIR, filename))['etag']
+        except FileNotFoundError:
+            initial_etag = ''
         html = f"""
         <!DOCTYPE html>
         <html lang="en">
@@ -144,11 +240,25 @@ def view_svg(filename):
         <body>
             <img src="/svg/{filename}" id="svgImage">
             <script>
+                let currentEtag = "{initial_etag}";
                 const evtSource = new EventSource("/updates/{filename}");
                 evtSource.onmessage = function(event) {{
-                    const img = document.getElementById('svgImage');
-                    const src = img.src.split('?')[0];
-                    img.src = `${{src}}?t=${{new Date().getTime()}}`;
+                    if (event.data === currentEtag) {{
+                        return;
+                    }}
+                    currentEtag = event.data;
+                    // Revalidate against the ETag instead of busting the cache with a timestamp
+                    fetch("/svg/{filename}", {{ cache: 'no-cache' }})
+                        .then(response => response.blob())
+                        .then(blob => {{
+                            const img = document.getElementById('svgImage');
+                            const previous = img.src;
+                            img.src = URL.createObjectURL(blob);
+                            if (previous.startsWith('blob:')) {{
+                                URL.revokeObjectURL(previous);
+                            }}
+                        }})
+                        .catch(error => console.error('Error fetching SVG:', error));
                 }};
             </script>
         </body>